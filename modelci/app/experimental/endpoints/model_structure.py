@@ -7,11 +7,19 @@ Date: 1/31/2021
 
 ML model structure related API
 """
+import asyncio
+import inspect
+import os
+import zipfile
+from concurrent.futures.thread import ThreadPoolExecutor
+from functools import lru_cache
+
 import torch
 from fastapi import APIRouter
+from fastapi.exceptions import HTTPException
 from modelci.hub.manager import get_remote_model_weight
 
-from modelci.types.bo import Engine
+from modelci.types.bo import Engine, Framework
 
 from modelci.persistence.service import ModelService
 
@@ -19,6 +27,61 @@ from modelci.experimental.model.model_structure import Structure
 
 router = APIRouter()
 
+# bounded pool for loading models, to avoid thrashing the disk with too many concurrent loads
+_executor = ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1))
+
+_TORCH_LOAD_PARAMETERS = inspect.signature(torch.load).parameters
+# loading onto the meta device is supported by `torch.load` since PyTorch 2.1, the release adding `mmap`
+_META_LOAD_SUPPORTED = 'mmap' in _TORCH_LOAD_PARAMETERS
+
+
+def _load_net(cache_path: str):
+    """
+    Load a PyTorch model from the local cache path.
+
+    Only the layer metadata is needed to build the model structure, so the parameters are loaded onto the
+    meta device without allocating their storages. For PyTorch versions without meta device support,
+    the parameters are loaded onto CPU. Zip archives are memory-mapped where supported, so that the
+    bytes of the parameter storages are not read from disk.
+    """
+    load_kwargs = dict()
+    # models are saved as pickled modules, which can not be loaded with the `weights_only=True` default
+    # since PyTorch 2.6
+    if 'weights_only' in _TORCH_LOAD_PARAMETERS:
+        load_kwargs['weights_only'] = False
+    if 'mmap' in _TORCH_LOAD_PARAMETERS and zipfile.is_zipfile(cache_path):
+        load_kwargs['mmap'] = True
+    map_location = torch.device('meta') if _META_LOAD_SUPPORTED else 'cpu'
+    return torch.load(cache_path, map_location=map_location, **load_kwargs)
+
+
+@lru_cache(maxsize=32)
+def _get_structure(id: str, cache_path: str, mtime: float) -> Structure:  # noqa
+    """
+    Get the model structure of a model given its ID and local cache file. The modification time of the cache
+    file is only part of the cache key, so that a re-downloaded model file will not hit a stale cached structure.
+    """
+    return Structure.from_model(_load_net(cache_path))
+
+
+def clear_structure_cache():
+    """Clear the cached model structures. This should be called once a model is updated or deleted."""
+    _get_structure.cache_clear()
+
+
+def _build_structure(id: str) -> Structure:  # noqa
+    """Download the local cache of a model and build its model structure. This function is blocking."""
+    model = ModelService.get_model_by_id(id)
+    # only PyTorch models saved as pickled modules are supported
+    if model.framework != Framework.PYTORCH or model.engine not in (Engine.NONE, Engine.PYTORCH):
+        raise HTTPException(
+            status_code=400,
+            detail=f'Model structure is only available for PyTorch model with engine `{Engine.NONE}` or '
+                   f'`{Engine.PYTORCH}`, but got framework {model.framework} and engine {model.engine}.',
+        )
+    cache_path = get_remote_model_weight(model)
+    return _get_structure(id, str(cache_path), cache_path.stat().st_mtime)
+
 
 @router.get('/{id}', response_model=Structure)
 async def get_model_structure(id: str):  # noqa
@@ -29,7 +92,8 @@ async def get_model_structure(id: str):  # noqa
         id (str): Model object ID.
     """
     # return model DAG
-    raise NotImplementedError('Method `get_model_structure` not implemented.')
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(_executor, _build_structure, id)
 
 
 @router.patch('/{id}')  # TODO: add response_model
@@ -17,6 +17,7 @@ from fastapi.exceptions import RequestValidationError, HTTPException
 from pydantic.error_wrappers import ErrorWrapper
 from starlette.responses import JSONResponse
 
+from modelci.app.experimental.endpoints.model_structure import clear_structure_cache
 from modelci.hub.manager import register_model
 from modelci.persistence.service_ import get_by_id, get_models, update_model, delete_model, exists_by_id
 from modelci.types.models import MLModel, BaseMLModel, ModelUpdateSchema, Framework, Engine, Task
@@ -48,7 +49,9 @@ def update(id: str, schema: ModelUpdateSchema):
             status_code=404,
             detail=f'Model ID {id} does not exist. You may change the ID',
         )
-    return update_model(id, schema)
+    model = update_model(id, schema)
+    clear_structure_cache()
+    return model
 
 
 @router.delete('/{id}', status_code=http.HTTPStatus.NO_CONTENT)
@@ -59,6 +62,7 @@ def delete(id: str):
             detail=f'Model ID {id} does not exist. You may change the ID',
         )
     delete_model(id)
+    clear_structure_cache()
 
 
 @router.post('/', status_code=201)
@@ -48,6 +48,7 @@ def main(args: argparse.Namespace) -> None:
                 'gpus': args.gpus,
                 'min_epochs': args.nb_epochs,
                 'max_epochs': args.nb_epochs,
+                'precision': args.precision,
             }
         )
         trainer.start()
@@ -76,6 +77,9 @@ def get_args() -> argparse.Namespace:
     )
     parser.add_argument("--batch-size", default=128, type=int, metavar="B", help="batch size", dest="batch_size")
     parser.add_argument("--gpus", type=int, default=1, help="number of gpus to use")
+    parser.add_argument(
+        "--precision", default=32, type=int, choices=[16, 32], help="16 for mixed precision training, 32 for full"
+    )
     parser.add_argument(
         "--lr", "--learning-rate", default=1e-2, type=float, metavar="LR", help="initial learning rate", dest="lr"
     )
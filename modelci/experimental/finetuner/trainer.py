@@ -123,7 +123,8 @@ class PyTorchTrainer(BaseTrainer):
         model = FineTuneModule(**fine_tune_module_kwargs)
         data_module = PyTorchDataModule(**training_job.data_module.dict(exclude_none=True))
 
-        trainer_kwargs = training_job.dict(exclude_none=True, include={'min_epochs', 'max_epochs'})
+        # `precision=16` enables mixed precision training, Lightning runs the forward pass under autocast
+        trainer_kwargs = training_job.dict(exclude_none=True, include={'min_epochs', 'max_epochs', 'precision'})
         trainer = cls(
             id=training_job.id,
             model=model,
@@ -36,7 +36,8 @@ Reference:
     https://github.com/PyTorchLightning/pytorch-lightning/blob/master/pl_examples/domain_templates/computer_vision_fine_tuning.py
 """
 
-from typing import Generator, Optional, Callable
+import inspect
+from typing import Generator, Optional, Callable, Iterable, FrozenSet, Dict, List
 
 import pytorch_lightning as pl
 import torch
@@ -47,40 +48,74 @@ from torch.optim.optimizer import Optimizer
 
 BN_TYPES = (torch.nn.BatchNorm1d, torch.nn.BatchNorm2d, torch.nn.BatchNorm3d)
 
+# `fused` and `foreach` Adam implementations are only available in newer PyTorch versions
+_ADAM_PARAMETERS = inspect.signature(optim.Adam).parameters
+# `set_to_none` of `Optimizer.zero_grad` is only available in newer PyTorch versions
+_ZERO_GRAD_PARAMETERS = inspect.signature(Optimizer.zero_grad).parameters
+
 
 #  --- Utility functions ---
 
 
-def _make_trainable(module: Module) -> None:
-    """Unfreezes a given module.
+def _iter_modules(module: Module) -> Generator:
+    """Yields a given module and all its submodules in pre-order.
+
+    The module tree is walked with an explicit stack of child iterators rather
+    than recursion, so it is not limited by the Python recursion limit on deep networks.
 
     Args:
-        module: The module to unfreeze
+        module: A given module
+
+    Returns:
+        Generator
     """
-    for param in module.parameters():
-        param.requires_grad = True
-    module.train()
+    visited = {module}
+    yield module
+    stack = [module.children()]
+    while stack:
+        m = next(stack[-1], None)
+        if m is None:
+            stack.pop()
+        elif m not in visited:
+            visited.add(m)
+            yield m
+            stack.append(m.children())
+
+
+def _leaf_modules(module: Module) -> Generator:
+    """Yields the leaf modules (i.e. modules without children) of a given module.
 
+    Args:
+        module: A given module
+
+    Returns:
+        Generator
+    """
+    for m in _iter_modules(module):
+        if next(m.children(), None) is None:
+            yield m
 
-def _recursive_freeze(module: Module, train_bn: bool = True) -> None:
-    """Freezes the layers of a given module.
+
+def _set_trainable(module: Module, trainable: bool) -> None:
+    """Sets the training mode and the parameter gradient flags of a single module, not its submodules.
 
     Args:
-        module: The module to freeze
-        train_bn: If True, leave the BatchNorm layers in training mode
+        module: A given module
+        trainable: If True, put the module in training mode and make its parameters trainable
     """
-    children = list(module.children())
-    if not children:
-        if not (isinstance(module, BN_TYPES) and train_bn):
-            for param in module.parameters():
-                param.requires_grad = False
-            module.eval()
-        else:
-            # Make the BN layers trainable
-            _make_trainable(module)
-    else:
-        for child in children:
-            _recursive_freeze(module=child, train_bn=train_bn)
+    module.training = trainable
+    for param in module.parameters(recurse=False):
+        param.requires_grad = trainable
+
+
+def _make_trainable(module: Module) -> None:
+    """Unfreezes a given module.
+
+    Args:
+        module: The module to unfreeze
+    """
+    for m in _iter_modules(module):
+        _set_trainable(m, True)
 
 
 def freeze(module: Module, n: Optional[int] = None, train_bn: bool = True) -> None:
@@ -96,46 +131,75 @@ def freeze(module: Module, n: Optional[int] = None, train_bn: bool = True) -> No
     n_max = len(children) if n is None else int(n)
 
     for child in children[:n_max]:
-        _recursive_freeze(module=child, train_bn=train_bn)
+        for m in _leaf_modules(child):
+            # freeze the layer, but leave the BN layers trainable if `train_bn`
+            _set_trainable(m, train_bn and isinstance(m, BN_TYPES))
 
     for child in children[n_max:]:
         _make_trainable(module=child)
 
 
-def filter_params(module: Module, train_bn: bool = True) -> Generator:
+def filter_params(
+        module: Module,
+        train_bn: bool = True,
+        leaves: Optional[Iterable[Module]] = None,
+        bn_ids: Optional[FrozenSet[int]] = None,
+) -> Generator:
     """Yields the trainable parameters of a given module.
 
     Args:
         module: A given module
         train_bn: If True, leave the BatchNorm layers in training mode
+        leaves: Precomputed leaf modules of the given module. If None, the
+            module tree will be walked to find them. When set, only these leaves are
+            visited and `module` is not walked, so they must be the leaf modules of
+            `module` itself, not of an ancestor.
+        bn_ids: Precomputed IDs of the BatchNorm layers of the given module (or of an
+            ancestor). If None, the BatchNorm layers are found by their types.
 
     Returns:
         Generator
     """
-    children = list(module.children())
-    if not children:
-        if not (isinstance(module, BN_TYPES) and train_bn):
-            for param in module.parameters():
+    if leaves is None:
+        leaves = _leaf_modules(module)
+    for leaf in leaves:
+        is_bn = isinstance(leaf, BN_TYPES) if bn_ids is None else id(leaf) in bn_ids
+        if not (is_bn and train_bn):
+            for param in leaf.parameters(recurse=False):
                 if param.requires_grad:
                     yield param
-    else:
-        for child in children:
-            for param in filter_params(module=child, train_bn=train_bn):
-                yield param
 
 
 def _unfreeze_and_add_param_group(
-        module: Module, optimizer: Optimizer, lr: Optional[float] = None, train_bn: bool = True
+        module: Module,
+        optimizer: Optimizer,
+        lr: Optional[float] = None,
+        train_bn: bool = True,
+        leaves: Optional[Iterable[Module]] = None,
+        bn_ids: Optional[FrozenSet[int]] = None,
 ):
-    """Unfreezes a module and adds its parameters to an optimizer."""
+    """Unfreezes a module and adds its parameters to an optimizer.
+
+    The precomputed leaf modules of the module can be passed as `leaves` to skip walking the
+    module tree, and the precomputed BatchNorm layer IDs as `bn_ids`, see :func:`filter_params`.
+    :meth:`FineTuneModule.unfreeze_and_add_param_group` passes its cached ones.
+    Parameters already registered in the optimizer (e.g. by an earlier fine-tuning stage that
+    unfroze a submodule of this module) are not added again, so that each parameter is updated
+    by exactly one parameter group.
+
+    Raises:
+        ValueError: If the module has no trainable parameters that are not in the optimizer yet.
+    """
     _make_trainable(module)
     params_lr = optimizer.param_groups[0]["lr"] if lr is None else float(lr)
-    optimizer.add_param_group(
-        {
-            "params": filter_params(module=module, train_bn=train_bn),
-            "lr": params_lr / 10.0,
-        }
-    )
+    registered = {id(p) for group in optimizer.param_groups for p in group["params"]}
+    params = [
+        p for p in filter_params(module=module, train_bn=train_bn, leaves=leaves, bn_ids=bn_ids)
+        if id(p) not in registered
+    ]
+    if not params:
+        raise ValueError(f'No new trainable parameters of {type(module).__name__} to add to the optimizer.')
+    optimizer.add_param_group({"params": params, "lr": params_lr / 10.0})
 
 
 #  --- Pytorch-lightning module ---
@@ -153,10 +217,15 @@ class FineTuneModule(pl.LightningModule):
             lr_scheduler_gamma: float = 1e-1,
             step_size: int = 7,
             num_workers: int = 6,
+            compile_net: bool = False,
             **kwargs,
     ) -> None:
         super().__init__()
         self.net = net
+        self.compile_net = compile_net
+        # compiled network forward, created in `setup` as it can not be pickled (e.g. by `ddp_spawn`)
+        self._compiled_forward = None
+        self._cache_modules()
         self.loss = loss
         self.batch_size = batch_size
         self.lr = lr
@@ -166,10 +235,54 @@ class FineTuneModule(pl.LightningModule):
 
         self.train_acc = pl.metrics.Accuracy()
         self.valid_acc = pl.metrics.Accuracy()
+        # running loss sums for the epoch level logs, accumulated on the device
+        self._train_loss_sum, self._train_steps = 0., 0
+        self._val_loss_sum, self._val_steps = 0., 0
         self.save_hyperparameters('loss', 'batch_size', 'lr', 'lr_scheduler_gamma', 'step_size', 'num_workers')
 
+    def _cache_modules(self):
+        """Caches the leaf modules of each child of the network (i.e. each layer group unfrozen at a fine-tuning
+        stage), and the IDs of the BatchNorm layers among them for filtering parameters. The IDs stay valid as
+        the cached leaf modules hold references to the layers.
+        """
+        self._child_leaves: Dict[int, List[Module]] = {
+            id(child): list(_leaf_modules(child)) for child in self.net.children()
+        }
+        self._bn_ids = frozenset(
+            id(m) for leaves in self._child_leaves.values() for m in leaves if isinstance(m, BN_TYPES)
+        )
+
+    def unfreeze_and_add_param_group(
+            self, module: Module, optimizer: Optimizer, lr: Optional[float] = None, train_bn: bool = True
+    ):
+        """Unfreezes a module of the network and adds its parameters to an optimizer.
+
+        The cached leaf modules and BatchNorm layer IDs are used when the module is a layer
+        group (a child) of the network, other modules are walked to find their leaf modules.
+        """
+        leaves = self._child_leaves.get(id(module))
+        bn_ids = None if leaves is None else self._bn_ids
+        _unfreeze_and_add_param_group(
+            module=module, optimizer=optimizer, lr=lr, train_bn=train_bn, leaves=leaves, bn_ids=bn_ids
+        )
+
+    def setup(self, stage):
+        # layers of the network may be swapped (e.g. a new classifier) after this module is created
+        self._cache_modules()
+        # Capture the network forward as a graph to reduce Python dispatcher overhead. The graph is compiled
+        # during the first batch and reused across epochs. PyTorch versions without `torch.compile` run eagerly.
+        if self.compile_net and self._compiled_forward is None and hasattr(torch, 'compile'):
+            self._compiled_forward = torch.compile(self.net.forward, mode='reduce-overhead', dynamic=False)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_compiled_forward'] = None
+        return state
+
     def forward(self, x):
 
+        if self._compiled_forward is not None:
+            return self._compiled_forward(x)
         return self.net(x)
 
     def training_step(self, batch, batch_idx):
@@ -177,48 +290,67 @@ class FineTuneModule(pl.LightningModule):
         # 1. Forward pass:
         x, y = batch
         outputs = self.forward(x)
-        preds = torch.argmax(outputs, dim=1)
 
         # 2. Compute loss & accuracy:
         train_loss = self.loss(outputs, y)
-        accuracy = self.train_acc(preds, y)
+        self.train_acc.update(outputs, y)
+        self._train_loss_sum += train_loss.detach()
+        self._train_steps += 1
 
         # 3. Outputs:
-        tqdm_dict = {'train_loss': train_loss, 'train_acc': accuracy}
-        self.log_dict(tqdm_dict, prog_bar=True)
+        # the accuracy metric is aggregated on the device and only computed at the end of the epoch
+        self.log('train_loss', train_loss, prog_bar=True, on_step=True, on_epoch=False)
+        self.log('train_acc', self.train_acc, prog_bar=True, on_step=False, on_epoch=True)
         return {"loss": train_loss}
 
     def training_epoch_end(self, outputs):
-        """Compute and log training loss and accuracy at the epoch level."""
+        """Compute and log training loss at the epoch level. Training accuracy is logged by its metric object."""
 
-        train_loss_mean = torch.stack([output['loss'] for output in outputs]).mean()
-        train_acc_mean = self.train_acc.compute()
-        self.log_dict({'train_loss': train_loss_mean, 'train_acc': train_acc_mean, 'step': self.current_epoch})
+        train_loss_mean = self._train_loss_sum / self._train_steps
+        self._train_loss_sum, self._train_steps = 0., 0
+        self.log('train_loss', train_loss_mean, sync_dist=True, sync_dist_op='mean')
+        self.log_dict({'step': self.current_epoch})
 
     def validation_step(self, batch, batch_idx):
 
         # 1. Forward pass:
         x, y = batch
         outputs = self.forward(x)
-        preds = torch.argmax(outputs, dim=1)
 
         # 2. Compute loss & accuracy:
         val_loss = self.loss(outputs, y)
-        accuracy = self.valid_acc(preds, y)
+        self.valid_acc.update(outputs, y)
+        self._val_loss_sum += val_loss.detach()
+        self._val_steps += 1
 
-        return {"val_loss": val_loss, 'val_acc': accuracy}
+        # 3. Outputs:
+        self.log('val_acc', self.valid_acc, prog_bar=True, on_step=False, on_epoch=True)
+        return {"val_loss": val_loss}
 
     def validation_epoch_end(self, outputs):
-        """Compute and log validation loss and accuracy at the epoch level."""
+        """Compute and log validation loss at the epoch level. Validation accuracy is logged by its metric object."""
 
-        val_loss_mean = torch.stack([output['val_loss'] for output in outputs]).mean()
-        train_acc_mean = self.valid_acc.compute()
-        log_dict = {'val_loss': val_loss_mean, 'val_acc': train_acc_mean}
-        self.log_dict(log_dict, prog_bar=True)
+        val_loss_mean = self._val_loss_sum / self._val_steps
+        self._val_loss_sum, self._val_steps = 0., 0
+        self.log('val_loss', val_loss_mean, prog_bar=True, sync_dist=True, sync_dist_op='mean')
         self.log_dict({'step': self.current_epoch})
 
+    def on_before_zero_grad(self, optimizer: Optimizer):
+        # Setting gradients to None skips a zero-filling kernel for every parameter, and leaves nothing to do
+        # for the following default `optimizer.zero_grad()`. This hook is used instead of overriding
+        # `optimizer_zero_grad`, which Lightning rejects together with `accumulate_grad_batches > 1`.
+        if 'set_to_none' in _ZERO_GRAD_PARAMETERS:
+            optimizer.zero_grad(set_to_none=True)
+
     def configure_optimizers(self):
-        optimizer = optim.Adam(filter(lambda p: p.requires_grad, self.parameters()), lr=self.lr)
+        trainable_params = [p for p in self.parameters() if p.requires_grad]
+        # update all parameters of a group in a single multi-tensor kernel rather than one kernel per parameter
+        adam_kwargs = dict()
+        if self.device.type == 'cuda' and 'fused' in _ADAM_PARAMETERS:
+            adam_kwargs['fused'] = True
+        elif 'foreach' in _ADAM_PARAMETERS:
+            adam_kwargs['foreach'] = True
+        optimizer = optim.Adam(trainable_params, lr=self.lr, **adam_kwargs)
 
         scheduler = StepLR(optimizer, step_size=self.step_size, gamma=self.lr_scheduler_gamma)
 
@@ -94,6 +94,9 @@ class ModelLayer(BaseModel, abc.ABC):
         kwargs = {'op_': Operation.EMPTY, 'type_': cls.__required_type__}
         signature = inspect.signature(layer_obj.__init__)
         for param in signature.parameters:
+            # skip the parameters not kept as layer attributes (e.g. `device` and `dtype` for layer construction)
+            if param not in cls.__fields__:
+                continue
             parser = getattr(cls, f'__{param}_parser__', lambda obj: getattr(obj, param))
             kwargs[param] = parser(layer_obj)
 
@@ -204,6 +207,9 @@ class AdaptiveAvgPool2d(_AdaptiveAvgPool):
 _LayerType = Union[Linear, Conv1d, Conv2d, ReLU, Tanh, BatchNorm1d, BatchNorm2d, MaxPool1d, MaxPool2d,
                    AdaptiveAvgPool1d, AdaptiveAvgPool2d]
 
+# map from layer type value (e.g. 'torch.nn.Linear') to the layer data model class
+_LAYER_CLASSES = {layer_cls.__required_type__.value: layer_cls for layer_cls in _LayerType.__args__}
+
 
 class Structure(BaseModel):
     # noinspection PyUnresolvedReferences
@@ -250,3 +256,28 @@ class Structure(BaseModel):
         default_factory=dict,
         example={'conv1': {'fc1': 'A'}}
     )
+
+    @classmethod
+    def from_model(cls, model) -> 'Structure':
+        """
+        Parse the model structure from a PyTorch model object.
+
+        Every submodule whose type is listed in :class:`LayerType` is parsed into a layer by
+        :meth:`ModelLayer.parse_layer_obj`. Submodules with other types (e.g. containers) are skipped.
+        The layer connections can not be obtained from the model object without tracing, so
+        :attr:`connection` is left empty.
+
+        Args:
+            model (torch.nn.Module): The model object to be parsed.
+
+        Returns:
+            Structure: Model structure with all supported layers.
+        """
+        layer = OrderedDict()
+        for name, module in model.named_modules():
+            module_type = type(module)
+            layer_cls = _LAYER_CLASSES.get(f'torch.nn.{module_type.__name__}')
+            if layer_cls is not None and module_type.__module__.startswith('torch.nn'):
+                layer[name] = layer_cls.parse_layer_obj(module)
+
+        return cls(layer=layer)
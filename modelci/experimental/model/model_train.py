@@ -12,6 +12,7 @@ from enum import Enum
 from typing import Optional, Union, Tuple, List
 
 from pydantic import BaseModel, PositiveInt, PositiveFloat, root_validator, validator, confloat
+from typing_extensions import Literal
 
 from modelci.experimental.model.common import ObjectIdStr
 from modelci.types.vo import Status
@@ -149,6 +150,7 @@ class TrainingJob(BaseModel):
     data_module: DataModuleProperty
     min_epochs: Optional[PositiveInt]
     max_epochs: PositiveInt
+    precision: Optional[Literal[16, 32]]
     optimizer_type: OptimizerType
     optimizer_property: _OptimizerProperty
     lr_scheduler_type: LRSchedulerType
@@ -213,6 +215,7 @@ class TrainingJobIn(BaseModel):
     data_module: DataModuleProperty
     min_epochs: Optional[PositiveInt]
     max_epochs: PositiveInt
+    precision: Optional[Literal[16, 32]]
     optimizer_type: OptimizerType
     optimizer_property: _OptimizerProperty
     lr_scheduler_type: LRSchedulerType
@@ -1,41 +1,85 @@
+import argparse
 import json
 import os
+import sys
 from pathlib import Path
+from tempfile import NamedTemporaryFile
 from typing import TextIO
 
 env_dir = Path(__file__).absolute().parents[1] / 'modelci'
 
 
 def _decode_dotenv(env_file: TextIO):
-    lines = env_file.readlines()
-
     env_data = dict()
-    for line in lines:
-        key, value = line.strip().split('=')
+    for line_no, line in enumerate(env_file, start=1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if '=' not in line:
+            raise ValueError(f'line {line_no}: expected `KEY=VALUE`, got {line!r}')
+        key, value = line.split('=', 1)
         env_data[key] = value
 
     return env_data
 
 
 def _encode_dotenv(env_data: dict, env_file: TextIO):
-    lines = [f'{k}={v}' for k, v in env_data.items()]
-    env_file.write(f'{os.linesep}'.join(lines))
+    env_file.write(os.linesep.join(f'{k}={v}' for k, v in env_data.items()))
+    env_file.write(os.linesep)
+
+
+def _load_dotenv(path: Path):
+    print(f'Read {path.name} ...')
+    try:
+        with open(path) as f:
+            return _decode_dotenv(f)
+    except FileNotFoundError:
+        sys.exit(f'Env file {path} not found.')
+    except ValueError as e:
+        sys.exit(f'Invalid env file {path}, {e}')
+
+
+def _save_dotenv(env_data: dict, path: Path):
+    # write to a temporary file in the same directory and rename it, so the .env file is never partially written
+    f = NamedTemporaryFile('w', dir=path.parent, prefix=f'{path.name}.', suffix='.tmp', delete=False)
+    tmp_path = Path(f.name)
+    try:
+        with f:
+            _encode_dotenv(env_data, f)
+        # temporary files are only readable by the owner, restore the permissions of a plainly created file
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp_path, 0o666 & ~umask)
+        tmp_path.replace(path)
+    except BaseException:
+        tmp_path.unlink()
+        raise
+
+
+def _is_up_to_date(inputs: list, outputs: list):
+    """Check if all output files exist and are newer than all the input files."""
+    if not all(path.exists() for path in inputs + outputs):
+        return False
+    return min(path.stat().st_mtime for path in outputs) > max(path.stat().st_mtime for path in inputs)
 
 
 if __name__ == '__main__':
-    backend_env, frontend_env = dict(), dict()
+    parser = argparse.ArgumentParser(description='Generate .env files for backend and frontend.')
+    parser.add_argument('-f', '--force', action='store_true', help='regenerate even if .env files are up to date')
+    args = parser.parse_args()
 
-    print('Read env-backend.env ...')
-    with open(env_dir / 'env-backend.env') as f:
-        backend_env.update(_decode_dotenv(f))
+    backend_env_path, mongodb_env_path = env_dir / 'env-backend.env', env_dir / 'env-mongodb.env'
+    frontend_env_path = env_dir / 'env-frontend.env'
+    backend_dotenv_path, frontend_dotenv_path = env_dir / '.env', env_dir.parent / 'frontend/.env'
 
-    print('Read env-mongodb.env ...')
-    with open(env_dir / 'env-mongodb.env') as f:
-        backend_env.update(_decode_dotenv(f))
+    input_paths = [backend_env_path, mongodb_env_path, frontend_env_path, Path(__file__).absolute()]
+    if not args.force and _is_up_to_date(input_paths, [backend_dotenv_path, frontend_dotenv_path]):
+        print('.env files are up to date.')
+        sys.exit(0)
 
-    print(f'Read env-frontend.env ...')
-    with open(env_dir / 'env-frontend.env') as f:
-        frontend_env.update(_decode_dotenv(f))
+    backend_env = _load_dotenv(backend_env_path)
+    backend_env.update(_load_dotenv(mongodb_env_path))
+    frontend_env = _load_dotenv(frontend_env_path)
 
     backend_url = f"{backend_env.get('SERVER_HOST', 'localhost')}:{backend_env.get('SERVER_PORT', 8000)}"
     frontend_url = f"{frontend_env.get('HOST', 'localhost')}:{frontend_env.get('PORT', 3333)}"
@@ -51,10 +95,8 @@ if __name__ == '__main__':
 
     # save to backend .env
     print(f'Write .env for backend with setup:\n {json.dumps(backend_env, indent=2)}')
-    with open(env_dir / '.env', 'w') as f:
-        _encode_dotenv(backend_env, f)
+    _save_dotenv(backend_env, backend_dotenv_path)
 
     # save to frontend .env
     print(f'Write .env for frontend with setup:\n {json.dumps(frontend_env, indent=2)}')
-    with open(env_dir.parent / 'frontend/.env', 'w') as f:
-        _encode_dotenv(frontend_env, f)
+    _save_dotenv(frontend_env, frontend_dotenv_path)
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Author: USER
+Date: 10/14/2026
+"""
+import os
+from collections import OrderedDict
+from types import SimpleNamespace
+
+import pytest
+import torch
+from fastapi.exceptions import HTTPException
+from torch import nn
+
+from modelci.app.experimental.endpoints import model_structure as structure_api
+from modelci.app.v1.endpoints import model as model_api
+from modelci.experimental.model.model_structure import Structure, LayerType, Operation
+from modelci.types.bo import Engine, Framework
+
+
+def test_structure_from_model():
+    net = nn.Sequential(OrderedDict([
+        ('conv', nn.Conv2d(3, 8, kernel_size=3, padding=1, bias=False)),
+        ('bn', nn.BatchNorm2d(8)),
+        ('relu', nn.ReLU(inplace=True)),
+        ('tanh', nn.Tanh()),
+        ('pool', nn.AdaptiveAvgPool2d(1)),
+        ('flatten', nn.Flatten()),
+        ('fc', nn.Linear(8, 10)),
+    ]))
+    structure = Structure.from_model(net)
+
+    # unsupported layers (`nn.Flatten`) and containers (`nn.Sequential`) are skipped
+    assert list(structure.layer) == ['conv', 'bn', 'relu', 'tanh', 'pool', 'fc']
+    assert all(layer.op_ == Operation.EMPTY for layer in structure.layer.values())
+    assert structure.connection == {}
+
+    conv = structure.layer['conv']
+    assert conv.type_ == LayerType.CONV_2D
+    assert (conv.in_channels, conv.out_channels, conv.kernel_size, conv.padding) == (3, 8, (3, 3), (1, 1))
+    assert conv.bias is False
+
+    bn = structure.layer['bn']
+    assert bn.type_ == LayerType.BN_2D
+    assert bn.num_features == 8
+
+    assert structure.layer['relu'].inplace is True
+    assert structure.layer['tanh'].type_ == LayerType.TANH
+    assert structure.layer['pool'].output_size == 1
+
+    fc = structure.layer['fc']
+    assert fc.type_ == LayerType.LINEAR
+    assert (fc.in_features, fc.out_features, fc.bias) == (8, 10, True)
+
+
+@pytest.fixture
+def remote_model(tmp_path, monkeypatch):
+    """A PyTorch model saved in a local cache path, with the model service and the model loading patched."""
+    cache_path = tmp_path / 'net.pth'
+    torch.save(nn.Sequential(nn.Linear(4, 2)), cache_path)
+    model = SimpleNamespace(framework=Framework.PYTORCH, engine=Engine.PYTORCH)
+    loaded, load_net_ = list(), structure_api._load_net
+
+    def load_net(path):
+        loaded.append(path)
+        return load_net_(path)
+
+    monkeypatch.setattr(structure_api, 'ModelService', SimpleNamespace(get_model_by_id=lambda id: model))
+    monkeypatch.setattr(structure_api, 'get_remote_model_weight', lambda model_: cache_path)
+    monkeypatch.setattr(structure_api, '_load_net', load_net)
+    structure_api.clear_structure_cache()
+    yield SimpleNamespace(model=model, cache_path=cache_path, loaded=loaded)
+    structure_api.clear_structure_cache()
+
+
+def test_structure_cache(remote_model):
+    structure = structure_api._build_structure('id')
+    assert list(structure.layer) == ['0']
+    assert structure_api._build_structure('id') == structure
+    assert len(remote_model.loaded) == 1
+
+    # a re-downloaded model file is loaded again
+    mtime = remote_model.cache_path.stat().st_mtime
+    os.utime(remote_model.cache_path, (mtime + 1, mtime + 1))
+    structure_api._build_structure('id')
+    assert len(remote_model.loaded) == 2
+
+
+def test_structure_cache_invalidation(remote_model, monkeypatch):
+    monkeypatch.setattr(model_api, 'exists_by_id', lambda id: True)
+    monkeypatch.setattr(model_api, 'update_model', lambda id, schema: None)
+    monkeypatch.setattr(model_api, 'delete_model', lambda id: None)
+
+    structure_api._build_structure('id')
+    model_api.update('id', schema=None)
+    structure_api._build_structure('id')
+    assert len(remote_model.loaded) == 2
+
+    model_api.delete('id')
+    structure_api._build_structure('id')
+    assert len(remote_model.loaded) == 3
+
+
+def test_structure_unsupported_engine(remote_model):
+    remote_model.model.engine = Engine.TORCHSCRIPT
+    with pytest.raises(HTTPException) as exc_info:
+        structure_api._build_structure('id')
+    assert exc_info.value.status_code == 400
+    assert not remote_model.loaded
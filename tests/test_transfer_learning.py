@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Author: USER
+Date: 10/14/2026
+"""
+import pytest
+import pytorch_lightning as pl
+import torch
+from torch import nn
+from torch.utils.data import DataLoader, TensorDataset
+
+from modelci.experimental.finetuner.transfer_learning import FineTuneModule, freeze, _unfreeze_and_add_param_group
+
+
+def _dataloader():
+    dataset = TensorDataset(torch.randn(64, 4), torch.randint(0, 2, (64,)))
+    return DataLoader(dataset, batch_size=8)
+
+
+class _OptimizerRecorder(pl.Callback):
+    """Records the learning rate and the state size of the optimizer at the start of training."""
+
+    def __init__(self):
+        self.lr, self.state_size = None, None
+
+    def on_train_start(self, trainer, pl_module):
+        optimizer = trainer.optimizers[0]
+        self.lr, self.state_size = optimizer.param_groups[0]['lr'], len(optimizer.state)
+
+
+def test_fit_after_lr_find_uses_new_optimizer():
+    model = FineTuneModule(net=nn.Sequential(nn.Linear(4, 8), nn.ReLU(), nn.Linear(8, 2)), loss=nn.CrossEntropyLoss())
+    recorder = _OptimizerRecorder()
+    trainer = pl.Trainer(
+        auto_lr_find=True, max_epochs=1, callbacks=[recorder], logger=False, checkpoint_callback=False,
+        weights_summary=None,
+    )
+    trainer.tune(model, train_dataloader=_dataloader())
+    trainer.fit(model, train_dataloader=_dataloader())
+
+    # `fit` starts from the suggested learning rate with a fresh optimizer, not the one of the LR finder sweep
+    assert recorder.lr == model.lr
+    assert recorder.state_size == 0
+
+
+def test_unfreeze_layer_group_with_cached_leaves():
+    net = nn.Sequential(nn.Sequential(nn.Linear(4, 8), nn.BatchNorm1d(8)), nn.Linear(8, 2))
+    model = FineTuneModule(net=net, loss=nn.CrossEntropyLoss())
+    # layers swapped after the module is created are picked up by `setup`
+    net[1] = nn.Linear(8, 3)
+    model.setup('fit')
+
+    freeze(module=net, n=1, train_bn=True)
+    optimizer = torch.optim.Adam(net[1].parameters(), lr=1e-2)
+    model.unfreeze_and_add_param_group(net[0], optimizer, train_bn=True)
+
+    # only the parameters of the layer group are added, BatchNorm layers are left out with `train_bn`
+    assert [id(p) for p in optimizer.param_groups[1]['params']] == [id(p) for p in net[0][0].parameters()]
+    assert optimizer.param_groups[1]['lr'] == 1e-3
+
+
+@pytest.mark.parametrize('train_bn', [True, False])
+def test_freeze(train_bn):
+    net = nn.Sequential(nn.Sequential(nn.Linear(4, 8), nn.BatchNorm1d(8)), nn.Linear(8, 2))
+    freeze(module=net, n=1, train_bn=train_bn)
+
+    linear, bn = net[0]
+    assert not any(p.requires_grad for p in linear.parameters())
+    assert not linear.training
+    assert all(p.requires_grad == train_bn for p in bn.parameters())
+    assert bn.training == train_bn
+    # containers are left in their mode, and the layers after index n are trainable
+    assert net[0].training
+    assert all(p.requires_grad for p in net[1].parameters())
+    assert net[1].training
+
+
+def test_freeze_deep_network():
+    leaf = nn.Linear(2, 2)
+    net = leaf
+    for _ in range(3000):
+        net = nn.Sequential(net)
+
+    freeze(module=net, train_bn=True)
+    assert not any(p.requires_grad for p in leaf.parameters())
+    assert not leaf.training
+
+    optimizer = torch.optim.SGD([nn.Parameter(torch.zeros(1))], lr=1e-1)
+    _unfreeze_and_add_param_group(module=net, optimizer=optimizer)
+    assert all(p.requires_grad for p in leaf.parameters())
+    assert [id(p) for p in optimizer.param_groups[1]['params']] == [id(p) for p in leaf.parameters()]
+
+
+def test_unfreeze_and_add_param_group_skips_registered_params():
+    net = nn.Sequential(nn.Linear(4, 8), nn.Linear(8, 2))
+    freeze(module=net, n=1)
+    optimizer = torch.optim.Adam(net[1].parameters(), lr=1e-2)
+
+    # only the parameters not in the optimizer yet are added
+    _unfreeze_and_add_param_group(module=net, optimizer=optimizer)
+    assert [id(p) for p in optimizer.param_groups[1]['params']] == [id(p) for p in net[0].parameters()]
+
+    with pytest.raises(ValueError):
+        _unfreeze_and_add_param_group(module=net, optimizer=optimizer)